@@ -14,7 +14,10 @@ class MangaAIApp:
         self.config = Config()
         self.frame_detector = FrameDetector()
         self.ocr_processor = OCRProcessor()
-        self.tts_generator = TTSGenerator(tts_provider=self.config.TTS_PROVIDER)
+        self.tts_generator = TTSGenerator(
+            tts_provider=self.config.TTS_PROVIDER,
+            cache_dir=self.config.TTS_CACHE_DIR
+        )
         self.llm_vision = LLM_Vision()
         self.llm_narrator = LLM_Narrator()
         
@@ -166,6 +169,7 @@ class MangaAIApp:
         with col2:
             if st.button("🧹 Clean Old Audio Files"):
                 self.tts_generator.cleanup_old_files(self.config.MAX_AUDIO_FILE_AGE_HOURS)
+                self.tts_generator.cleanup_cache(self.config.MAX_TTS_CACHE_AGE_HOURS)
                 st.success("Audio files cleaned!")
         
         with col3:
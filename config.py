@@ -50,6 +50,8 @@ class Config:
     ALLOWED_IMAGE_TYPES = ["png", "jpg", "jpeg"]
     AUDIO_OUTPUT_DIR = "./audio_output"
     MAX_AUDIO_FILE_AGE_HOURS = int(os.getenv("MAX_AUDIO_FILE_AGE_HOURS", "24"))
+    TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+    MAX_TTS_CACHE_AGE_HOURS = int(os.getenv("MAX_TTS_CACHE_AGE_HOURS", "168"))
     
     # OCR settings (English only)
     TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--psm 6")
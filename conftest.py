@@ -0,0 +1,160 @@
+"""
+Shared pytest configuration for the mangAI test suite
+"""
+
+import os
+import sys
+import base64
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+from unittest.mock import patch, MagicMock
+
+import pytest
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# A few silent MPEG-1 Layer III frames (128 kbps, 44.1 kHz, mono): a 4-byte
+# header followed by an all-zero 413-byte body per frame, ~2 KB in total
+SILENT_MP3_BYTES = (bytes.fromhex("fffb90c0") + bytes(413)) * 5
+
+
+def pytest_addoption(parser):
+    """Register the command line options of the test suite"""
+    parser.addoption(
+        "--run-live",
+        action="store_true",
+        default=False,
+        help="Call the real Speechify/ElevenLabs APIs instead of mocked HTTP responses"
+    )
+
+
+def pytest_configure(config):
+    """Make the project importable and load environment variables once per run"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    
+    load_dotenv()
+
+
+@pytest.fixture(scope="session")
+def tts_module():
+    """The modules.tts_generator module, imported once per session (once per xdist worker)"""
+    import modules.tts_generator
+    return modules.tts_generator
+
+
+@pytest.fixture(scope="session")
+def TTSGeneratorCls(tts_module):
+    """The TTSGenerator class"""
+    return tts_module.TTSGenerator
+
+
+@dataclass
+class FakeLanguage:
+    """Minimal mirror of a Speechify voice model language"""
+    locale: str
+
+
+@dataclass
+class FakeModel:
+    """Minimal mirror of a Speechify voice model"""
+    name: str
+    languages: "Optional[list[FakeLanguage]]"
+
+
+@dataclass
+class FakeVoice:
+    """Minimal mirror of a Speechify GetVoice object"""
+    gender: str
+    tags: "list[str]"
+    models: "Optional[list[FakeModel]]"
+
+
+@pytest.fixture(scope="session")
+def make_voice():
+    """Factory for a Speechify-like voice with a single model in a single locale"""
+    def make(name: str, gender: str = "male", locale: str = "en-US", tags: "list[str]" = ()) -> FakeVoice:
+        return FakeVoice(gender, list(tags), [FakeModel(name, [FakeLanguage(locale)])])
+    return make
+
+
+@pytest.fixture(scope="class")
+def mock_tts_clients():
+    """Replace the Speechify and ElevenLabs SDK clients with mocks for unit tests"""
+    fake_keys = {
+        "SPEECHIFY_API_KEY": "test-speechify-key",
+        "ELEVENLABS_API_KEY": "test-elevenlabs-key"
+    }
+    with patch.dict(os.environ, fake_keys), \
+            patch("modules.tts_generator.SPEECHIFY_AVAILABLE", True), \
+            patch("modules.tts_generator.ELEVENLABS_AVAILABLE", True), \
+            patch("modules.tts_generator.Speechify", MagicMock()), \
+            patch("modules.tts_generator.GetSpeechOptionsRequest", MagicMock()), \
+            patch("modules.tts_generator.GetStreamOptionsRequest", MagicMock()), \
+            patch("modules.tts_generator.ElevenLabs", MagicMock()), \
+            patch("modules.tts_generator.VoiceSettings", MagicMock()):
+        yield
+
+
+@pytest.fixture(scope="session")
+def run_live(pytestconfig):
+    """Whether the API tests talk to the real TTS providers (--run-live)"""
+    return pytestconfig.getoption("--run-live")
+
+
+@pytest.fixture
+def mock_tts_http(run_live, monkeypatch):
+    """
+    Serve the Speechify and ElevenLabs HTTP endpoints locally unless --run-live is given
+    
+    The real SDK clients are still used, so request building and response
+    parsing are exercised; only the network round trip is replaced.
+    """
+    if run_live:
+        yield None
+        return
+    
+    # Ask the module what it actually imported: speechify-api releases
+    # without speechify.tts import fine but leave Speechify unavailable
+    import modules.tts_generator as tts_generator
+    if not tts_generator.SPEECHIFY_AVAILABLE:
+        pytest.skip("Speechify SDK with speechify.tts is not installed")
+    if not tts_generator.ELEVENLABS_AVAILABLE:
+        pytest.skip("ElevenLabs SDK is not installed")
+    respx = pytest.importorskip("respx")
+    
+    SPEECHIFY_API_URL = tts_generator.SPEECHIFY_API_URL
+    ELEVENLABS_API_URL = tts_generator.ELEVENLABS_API_URL
+    
+    monkeypatch.setenv("SPEECHIFY_API_KEY", "test-speechify-key")
+    monkeypatch.setenv("ELEVENLABS_API_KEY", "test-elevenlabs-key")
+    
+    with respx.mock(assert_all_called=False) as router:
+        router.post(f"{SPEECHIFY_API_URL}/v1/audio/speech").respond(json={
+            "audio_data": base64.b64encode(SILENT_MP3_BYTES).decode("ascii"),
+            "audio_format": "mp3",
+            "billable_characters_count": 0
+        })
+        router.get(f"{SPEECHIFY_API_URL}/v1/voices").respond(json=[])
+        router.post(url__regex=rf"^{ELEVENLABS_API_URL}/v1/text-to-speech/.*").respond(
+            content=SILENT_MP3_BYTES,
+            headers={"Content-Type": "audio/mpeg"}
+        )
+        yield router
+
+
+@pytest.fixture(scope="session")
+def sample_manga_script():
+    """Sample manga script for testing (read-only, shared by the session)"""
+    return (
+        MappingProxyType({
+            "role": "narrator",
+            "description": "The sun rises over the quiet village."
+        }),
+        MappingProxyType({
+            "role": "character",
+            "description": "Hello, world! This is a test."
+        })
+    )
@@ -4,15 +4,45 @@ Converts processed text into audio using text-to-speech technology
 Supports both ElevenLabs (legacy) and Speechify APIs
 """
 
+import io
 import os
-import uuid
+import re
+import secrets
+import asyncio
+import threading
+import concurrent.futures
 import time
 import datetime
-import base64
-from typing import Dict, Any, Optional
+import hashlib
+import functools
+import logging
+import tempfile
+import importlib.util
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Dict, Any, Optional, AsyncIterator, Iterator
 
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
+# Prefer the SIMD-accelerated base64 decoder when it is installed
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+# Prefer orjson for encoding/decoding the raw REST payloads when it is installed
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    import json
+    
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    
+    json_loads = json.loads
+
 # Try to import ElevenLabs (legacy support)
 try:
     from elevenlabs import ElevenLabs, VoiceSettings
@@ -26,55 +56,293 @@ except ImportError:
 # Try to import Speechify (new implementation)
 try:
     from speechify import Speechify
-    from speechify.tts import GetSpeechOptionsRequest
+    from speechify.tts import GetSpeechOptionsRequest, GetStreamOptionsRequest
     SPEECHIFY_AVAILABLE = True
 except ImportError:
     print("Warning: Speechify package not available. Please install: pip install speechify-api")
     Speechify = None
     GetSpeechOptionsRequest = None
+    GetStreamOptionsRequest = None
     SPEECHIFY_AVAILABLE = False
 
+# Try to import httpx (shared connection pool for the provider SDKs)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 lets concurrent segment requests share one TLS connection
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Try to import async I/O helpers (optional non-blocking generation path)
+try:
+    import aiohttp
+    import aiofiles
+    ASYNC_IO_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    aiofiles = None
+    ASYNC_IO_AVAILABLE = False
+
+SPEECHIFY_API_URL = "https://api.sws.speechify.com"
+SPEECHIFY_SPEECH_URL = f"{SPEECHIFY_API_URL}/v1/audio/speech"
+ELEVENLABS_API_URL = "https://api.elevenlabs.io"
+
+# Per-request timeouts in seconds (the SDK defaults, which a custom httpx client would drop)
+SPEECHIFY_REQUEST_TIMEOUT = 60.0
+ELEVENLABS_REQUEST_TIMEOUT = 240.0
+
+
+def _strip_id3(audio_bytes: bytes, keep_header: bool = False, keep_trailer: bool = False) -> memoryview:
+    """
+    Return a view of MP3 bytes without the leading ID3v2 and/or trailing ID3v1 tag
+    
+    Args:
+        audio_bytes: MP3 file contents
+        keep_header: Keep a leading ID3v2 tag
+        keep_trailer: Keep a trailing ID3v1 tag
+    """
+    start, end = 0, len(audio_bytes)
+    
+    if not keep_header and end >= 10 and audio_bytes[:3] == b"ID3":
+        # Tag size is a 28-bit synchsafe integer; a footer adds another 10 bytes
+        size = ((audio_bytes[6] & 0x7f) << 21 | (audio_bytes[7] & 0x7f) << 14
+                | (audio_bytes[8] & 0x7f) << 7 | (audio_bytes[9] & 0x7f))
+        start = min(end, 10 + size + (10 if audio_bytes[5] & 0x10 else 0))
+    
+    if not keep_trailer and end - start >= 128 and audio_bytes[end - 128:end - 125] == b"TAG":
+        end -= 128
+    
+    return memoryview(audio_bytes)[start:end]
+
+
+def _iter_mp3_segments(segment_audio: "list[bytes]") -> Iterator[memoryview]:
+    """
+    Yield per-segment MP3 payloads that can be written back to back as one file
+    
+    MP3 frames are self-synchronizing, so same-encoder segments concatenate
+    without re-encoding. Only the first segment keeps its ID3v2 header and
+    only the last keeps its ID3v1 trailer.
+    """
+    last = len(segment_audio) - 1
+    for i, audio_bytes in enumerate(segment_audio):
+        yield _strip_id3(audio_bytes, keep_header=(i == 0), keep_trailer=(i == last))
+
+
+def _iter_stripped_chunks(chunks, keep_header: bool = False, keep_trailer: bool = False) -> Iterator[bytes]:
+    """
+    Streaming counterpart of _strip_id3 for one segment arriving in chunks
+    
+    Yields the same bytes _strip_id3 would return for the joined chunks,
+    buffering only the 10-byte ID3v2 header and the last 128 bytes.
+    
+    Args:
+        chunks: MP3 byte chunks of a single segment, in order
+        keep_header: Keep a leading ID3v2 tag
+        keep_trailer: Keep a trailing ID3v1 tag
+    """
+    head = b""
+    skip = 0 if keep_header else None  # None until the ID3v2 header has been checked
+    tail = b""
+    
+    for chunk in chunks:
+        if not chunk:
+            continue
+        
+        if skip is None:
+            head += chunk
+            if len(head) < 10:
+                continue
+            skip = 0
+            if head[:3] == b"ID3":
+                skip = (10 + ((head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14
+                              | (head[8] & 0x7f) << 7 | (head[9] & 0x7f))
+                        + (10 if head[5] & 0x10 else 0))
+            chunk, head = head, b""
+        
+        if skip:
+            dropped = min(skip, len(chunk))
+            chunk = chunk[dropped:]
+            skip -= dropped
+            if not chunk:
+                continue
+        
+        if keep_trailer:
+            yield chunk
+            continue
+        
+        # Hold back the last 128 bytes in case they are an ID3v1 tag
+        tail += chunk
+        if len(tail) > 128:
+            yield tail[:-128]
+            tail = tail[-128:]
+    
+    # A segment shorter than an ID3v2 header is passed through untouched
+    tail += head
+    if tail and not (len(tail) == 128 and tail[:3] == b"TAG"):
+        yield tail
+
+
+def _count_words(text: str, chunk_size: int = 64 * 1024) -> int:
+    """
+    Count whitespace-separated words, same as len(text.split())
+    
+    Splits fixed-size windows so only one window's word list is alive at a
+    time, which keeps memory flat for very long scripts.
+    """
+    words = 0
+    prev_is_space = True
+    
+    for start in range(0, len(text), chunk_size):
+        window = text[start:start + chunk_size]
+        words += len(window.split())
+        # A word running across the window boundary was counted twice
+        if not prev_is_space and not window[0].isspace():
+            words -= 1
+        prev_is_space = window[-1].isspace()
+    
+    return words
+
+
+def _write_all(fd: int, data) -> None:
+    """Write a bytes-like object to a file descriptor, retrying short writes"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _write_file_bytes(path: str, data: bytes):
+    """Write bytes to a file with raw os.write calls, bypassing Python's buffered I/O layers"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _staging_path(path: str) -> str:
+    """Unique sibling path to write a file to before renaming it into place"""
+    return f"{path}.{secrets.token_hex(4)}.part"
+
+
+def _write_audio_file(path: str, segment_audio: "list[bytes]"):
+    """
+    Write MP3 segments back to back into path, atomically
+    
+    Segments stay in memory until this single write; the file is staged under
+    a unique name and renamed into place, so concurrent workers sharing an
+    output directory never observe (or collide on) a partially written MP3.
+    """
+    payloads = list(_iter_mp3_segments(segment_audio))
+    total_size = sum(len(payload) for payload in payloads)
+    
+    staging_path = _staging_path(path)
+    try:
+        fd = os.open(staging_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            # Reserve the final size once instead of extending the file write by write
+            if total_size and hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(fd, 0, total_size)
+                except OSError:
+                    pass  # Not supported by this filesystem; writes still work
+            for payload in payloads:
+                _write_all(fd, payload)
+        finally:
+            os.close(fd)
+        os.replace(staging_path, path)
+    except BaseException:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+
+
+def run_coroutine_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code
+    
+    Uses asyncio.run when no event loop is running in the current thread.
+    When one is (e.g. notebooks or async frameworks), the coroutine runs on
+    a fresh loop in a worker thread instead of failing.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
 
 class TTSGenerator:
-    def __init__(self, output_dir: str = "./audio_output", tts_provider: str = "speechify"):
+    # One pass over a whole script: a line is narration in brackets,
+    # "Character: dialogue", or plain narration (surrounding whitespace ignored)
+    _SCRIPT_RE = re.compile(
+        r'^[^\S\n]*(?:'
+        r'\[(?P<narrator>.*?)\].*'
+        r'|(?P<character>[A-Z](?:[a-zA-Z]|[^\S\n])*?):[^\S\n]*(?P<dialogue>\S.*?)'
+        r'|(?P<default>\S.*?)'
+        r')[^\S\n]*$',
+        re.MULTILINE
+    )
+    
+    # Voice cues: [narrator text] anywhere, "Character: " at a line start
+    _NARRATOR_CUE_RE = re.compile(r'\[.*?\]')
+    _CHARACTER_CUE_RE = re.compile(r'^[A-Z][a-zA-Z\s]*:\s+', re.MULTILINE)
+    
+    # Built once at class definition; read-only so instances can share them
+    supported_languages = MappingProxyType({
+        "en": {"voice": "en-US", "rate": 150},  # English only
+        "fr-FR": {"voice": "fr-FR", "rate": 150},
+        "de-DE": {"voice": "de-DE", "rate": 150},
+        "es-ES": {"voice": "es-ES", "rate": 150},
+        "pt-BR": {"voice": "pt-BR", "rate": 150},
+        "pt-PT": {"voice": "pt-PT", "rate": 150},
+        # Beta languages
+        "ar-AE": {"voice": "ar-AE", "rate": 150},
+        "da-DK": {"voice": "da-DK", "rate": 150},
+        "nl-NL": {"voice": "nl-NL", "rate": 150},
+        "et-EE": {"voice": "et-EE", "rate": 150},
+        "fi-FI": {"voice": "fi-FI", "rate": 150},
+        "el-GR": {"voice": "el-GR", "rate": 150},
+        "he-IL": {"voice": "he-IL", "rate": 150},
+        "hi-IN": {"voice": "hi-IN", "rate": 150},
+        "it-IT": {"voice": "it-IT", "rate": 150},
+        "ja-JP": {"voice": "ja-JP", "rate": 150},
+        "nb-NO": {"voice": "nb-NO", "rate": 150},
+        "pl-PL": {"voice": "pl-PL", "rate": 150},
+        "ru-RU": {"voice": "ru-RU", "rate": 150},
+        "sv-SE": {"voice": "sv-SE", "rate": 150},
+        "tr-TR": {"voice": "tr-TR", "rate": 150},
+        "uk-UA": {"voice": "uk-UA", "rate": 150},
+        "vi-VN": {"voice": "vi-VN", "rate": 150}
+    })
+    
+    # Languages without an entry use "simba-multilingual"
+    _SPEECHIFY_MODEL_FOR_LANG = MappingProxyType({"en": "simba-english"})
+    
+    def __init__(self, output_dir: str = "./audio_output", tts_provider: str = "speechify", tts_concurrency: int = 4,
+                 idle_connection_timeout: float = 60.0, cache_dir: Optional[str] = None):
         """
         Initialize the TTS generator
         
         Args:
             output_dir: Directory to save audio files
             tts_provider: TTS provider to use ("speechify" or "elevenlabs")
+            tts_concurrency: Maximum number of script segments synthesized in parallel
+            idle_connection_timeout: Seconds an idle pooled connection is kept open
+            cache_dir: Directory for cached segment audio (None disables caching)
         """
-        self.supported_languages = {
-            "en": {"voice": "en-US", "rate": 150},  # English only
-            "fr-FR": {"voice": "fr-FR", "rate": 150},
-            "de-DE": {"voice": "de-DE", "rate": 150},
-            "es-ES": {"voice": "es-ES", "rate": 150},
-            "pt-BR": {"voice": "pt-BR", "rate": 150},
-            "pt-PT": {"voice": "pt-PT", "rate": 150},
-            # Beta languages
-            "ar-AE": {"voice": "ar-AE", "rate": 150},
-            "da-DK": {"voice": "da-DK", "rate": 150},
-            "nl-NL": {"voice": "nl-NL", "rate": 150},
-            "et-EE": {"voice": "et-EE", "rate": 150},
-            "fi-FI": {"voice": "fi-FI", "rate": 150},
-            "el-GR": {"voice": "el-GR", "rate": 150},
-            "he-IL": {"voice": "he-IL", "rate": 150},
-            "hi-IN": {"voice": "hi-IN", "rate": 150},
-            "it-IT": {"voice": "it-IT", "rate": 150},
-            "ja-JP": {"voice": "ja-JP", "rate": 150},
-            "nb-NO": {"voice": "nb-NO", "rate": 150},
-            "pl-PL": {"voice": "pl-PL", "rate": 150},
-            "ru-RU": {"voice": "ru-RU", "rate": 150},
-            "sv-SE": {"voice": "sv-SE", "rate": 150},
-            "tr-TR": {"voice": "tr-TR", "rate": 150},
-            "uk-UA": {"voice": "uk-UA", "rate": 150},
-            "vi-VN": {"voice": "vi-VN", "rate": 150}
-        }
-        
         self.current_language = "en"
         self.current_rate = 150
         self.output_dir = output_dir
         self.tts_provider = tts_provider.lower()
+        self.tts_concurrency = max(1, tts_concurrency)
+        self.idle_connection_timeout = idle_connection_timeout
+        self.cache_dir = cache_dir
         
         # Load environment variables
         load_dotenv()
@@ -100,6 +368,11 @@ class TTSGenerator:
         # Initialize clients
         self.elevenlabs_client = None
         self.speechify_client = None
+        self.http_client = None
+        
+        # Lookup indexes for the last voice list seen by filter_voice_models
+        self._voice_index = None
+        self._voice_index_source = None
         
         # Initialize based on provider preference
         if self.tts_provider == "speechify":
@@ -115,8 +388,19 @@ class TTSGenerator:
                 self.tts_provider = "speechify"
                 self._initialize_speechify()
         
+        # Resolve role voices for the active provider once
+        self._resolve_role_voices()
+        
         # Ensure audio output directory exists
         os.makedirs(self.output_dir, exist_ok=True)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def _resolve_role_voices(self):
+        """Cache the narrator/character voice IDs of the active provider"""
+        voice_ids = self.voice_ids if self.tts_provider == "elevenlabs" else self.speechify_voice_ids
+        self._narrator_voice = voice_ids['narrator']
+        self._character_voice = voice_ids['character']
     
     def _initialize_speechify(self):
         """Initialize Speechify client"""
@@ -129,7 +413,7 @@ class TTSGenerator:
             return
         
         try:
-            self.speechify_client = Speechify(token=self.speechify_api_key)
+            self.speechify_client = Speechify(token=self.speechify_api_key, **self._http_client_kwargs(SPEECHIFY_REQUEST_TIMEOUT))
             print("Speechify client initialized successfully")
         except Exception as e:
             print(f"Error: Could not initialize Speechify client: {e}")
@@ -145,11 +429,90 @@ class TTSGenerator:
             return
         
         try:
-            self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_api_key)
+            self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_api_key, **self._http_client_kwargs(ELEVENLABS_REQUEST_TIMEOUT))
             print("ElevenLabs client initialized successfully")
         except Exception as e:
             print(f"Error: Could not initialize ElevenLabs client: {e}")
     
+    def _http_client_kwargs(self, timeout: float) -> Dict[str, Any]:
+        """
+        SDK constructor arguments for the shared pooled HTTP client
+        
+        Both SDKs are built on httpx, so one keep-alive pool is reused across
+        segment requests instead of paying a TCP+TLS handshake per request.
+        The timeout is passed explicitly because the SDKs otherwise send
+        timeout=None with every request made through a custom client.
+        
+        Args:
+            timeout: Per-request timeout in seconds for this provider
+        """
+        if not HTTPX_AVAILABLE:
+            return {"timeout": timeout}
+        
+        if self.http_client is None:
+            transport = httpx.HTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=32,
+                    max_keepalive_connections=32,
+                    keepalive_expiry=self.idle_connection_timeout
+                ),
+                retries=3
+            )
+            self.http_client = httpx.Client(transport=transport, timeout=timeout, follow_redirects=True)
+        
+        return {"httpx_client": self.http_client, "timeout": timeout}
+    
+    def close(self):
+        """Close the shared HTTP connection pool; the provider clients cannot be used afterwards"""
+        if self.http_client is not None:
+            self.http_client.close()
+            self.http_client = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def prewarm_connections(self, background: bool = True):
+        """
+        Open pooled connections to the active provider before the first request
+        
+        Opt-in: nothing calls this automatically. Over HTTP/1.1 it sends
+        tts_concurrency lightweight requests at once so the first batch of
+        segments finds that many warm keep-alive connections. When h2 is
+        installed, requests are multiplexed over one HTTP/2 connection, so a
+        single request is enough. Idle connections are closed again after
+        idle_connection_timeout seconds. Failures are ignored.
+        
+        Args:
+            background: Warm up in a daemon thread instead of blocking
+        """
+        # Captured once: close() may reset self.http_client while warm-up runs
+        client = self.http_client
+        if client is None:
+            return
+        
+        url = SPEECHIFY_API_URL if self.tts_provider == "speechify" else ELEVENLABS_API_URL
+        warm_count = 1 if HTTP2_AVAILABLE else self.tts_concurrency
+        
+        def warm_one(_):
+            try:
+                client.head(url)
+            except (httpx.HTTPError, RuntimeError) as e:
+                # RuntimeError: the client was closed before this request went out
+                print(f"Could not prewarm connection to {url}: {e}")
+        
+        def warm_all():
+            with concurrent.futures.ThreadPoolExecutor(max_workers=warm_count) as executor:
+                list(executor.map(warm_one, range(warm_count)))
+        
+        if background:
+            threading.Thread(target=warm_all, daemon=True).start()
+        else:
+            warm_all()
+    
     def set_output_directory(self, output_dir: str):
         """Set a new output directory for audio files"""
         self.output_dir = output_dir
@@ -180,24 +543,240 @@ class TTSGenerator:
         if not manga_script or len(manga_script) == 0:
             raise ValueError("No script data provided for audio generation")
         
+        provider = self._require_active_client()
+        
+        base_filename = self._new_base_filename(self.tts_provider)
+        segment_audio, combined_text = self._synth_bytes(manga_script, language)
+        
+        # Save the audio (MP3 frames are concatenated without re-encoding)
+        save_file_path = f"{self.output_dir}/{base_filename}.mp3"
+        
+        _write_audio_file(save_file_path, segment_audio)
+        
+        print(f"{provider} audio saved at {save_file_path}")
+        
+        # Create transcript file
+        self._create_transcript_file(base_filename, manga_script, combined_text, provider)
+        
+        return save_file_path
+    
+    def generate_audio_from_script_to_stream(self, manga_script: "list[dict]", language: str = "en") -> io.BytesIO:
+        """
+        Generate audio from structured manga script data without touching the disk
+        
+        Intended for web handlers that send the MP3 straight to the client,
+        e.g. StreamingResponse(tts.generate_audio_from_script_to_stream(script), media_type="audio/mpeg").
+        No transcript file is written.
+        
+        Args:
+            manga_script: List of dictionaries with 'role' and 'description' keys
+            language: Language code
+            
+        Returns:
+            In-memory MP3 stream positioned at the start
+        """
+        if not manga_script or len(manga_script) == 0:
+            raise ValueError("No script data provided for audio generation")
+        
+        self._require_active_client()
+        
+        segment_audio, _ = self._synth_bytes(manga_script, language)
+        
+        stream = io.BytesIO()
+        for audio_bytes in _iter_mp3_segments(segment_audio):
+            stream.write(audio_bytes)
+        stream.seek(0)
+        
+        return stream
+    
+    def _require_active_client(self) -> str:
+        """
+        Check that the active provider has a configured client
+        
+        Returns:
+            Provider display name, e.g. "Speechify"
+        """
         if self.tts_provider == "speechify":
             if not self.speechify_client:
                 raise Exception("Speechify API is not configured. Please set SPEECHIFY_API_KEY environment variable.")
+            return "Speechify"
+        if not self.elevenlabs_client:
+            raise Exception("ElevenLabs API is not configured. Please set ELEVENLABS_API_KEY environment variable.")
+        return "ElevenLabs"
+    
+    def _synth_bytes(self, manga_script: "list[dict]", language: str) -> "tuple[list[bytes], str]":
+        """
+        Synthesize a script with the active provider
+        
+        Returns:
+            Per-segment MP3 bytes in script order, and the joined script text
+        """
+        if self.tts_provider == "speechify":
             return self._generate_speechify_audio(manga_script, language)
+        return self._generate_elevenlabs_audio(manga_script, language)
+    
+    async def agenerate_audio_from_script(self, manga_script: "list[dict]", language: str = "en") -> str:
+        """
+        Asynchronously generate audio from structured manga script data
+        
+        Speechify segments are requested concurrently over aiohttp and the MP3
+        is written with aiofiles, so the event loop is not blocked on network
+        or disk I/O. Other providers run the synchronous path in a worker thread.
+        
+        Args:
+            manga_script: List of dictionaries with 'role' and 'description' keys
+            language: Language code
+            
+        Returns:
+            Path to generated audio file
+        """
+        if not manga_script or len(manga_script) == 0:
+            raise ValueError("No script data provided for audio generation")
+        
+        if self.tts_provider != "speechify":
+            return await asyncio.to_thread(self.generate_audio_from_script, manga_script, language)
+        
+        if not self.speechify_api_key:
+            raise Exception("Speechify API is not configured. Please set SPEECHIFY_API_KEY environment variable.")
+        if not ASYNC_IO_AVAILABLE:
+            raise Exception("Async generation requires aiohttp and aiofiles. Please install: pip install aiohttp aiofiles")
+        
+        base_filename = self._new_base_filename("speechify")
+        
+        combined_text_parts = self._collect_text_parts(manga_script, "Speechify")
+        combined_text = " ... ".join(combined_text_parts)
+        
+        voice_id = self.speechify_voice_ids['narrator']
+        model = self._SPEECHIFY_MODEL_FOR_LANG.get(language, "simba-multilingual")
+        
+        print(f"Generating Speechify audio asynchronously with voice {voice_id}, model {model}...")
+        
+        # The connector limit bounds how many segment requests are in flight
+        connector = aiohttp.TCPConnector(limit=self.tts_concurrency, keepalive_timeout=self.idle_connection_timeout)
+        headers = {"Authorization": f"Bearer {self.speechify_api_key}"}
+        
+        try:
+            async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+                segment_audio = await asyncio.gather(*(
+                    self._asynth_one_speechify(session, text, voice_id, model, language)
+                    for text in combined_text_parts
+                ))
+            
+            save_file_path = f"{self.output_dir}/{base_filename}.mp3"
+            
+            staging_path = _staging_path(save_file_path)
+            try:
+                async with aiofiles.open(staging_path, "xb") as f:
+                    for audio_bytes in _iter_mp3_segments(segment_audio):
+                        await f.write(audio_bytes)
+                await asyncio.to_thread(os.replace, staging_path, save_file_path)
+            except BaseException:
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+                raise
+            
+            print(f"Speechify audio saved at {save_file_path}")
+            
+            await asyncio.to_thread(self._create_transcript_file, base_filename, manga_script, combined_text, "Speechify")
+            
+            return save_file_path
+            
+        except Exception as e:
+            print(f"Error generating Speechify audio: {e}")
+            raise
+    
+    async def stream_audio_from_script(self, manga_script: "list[dict]", language: str = "en") -> AsyncIterator[bytes]:
+        """
+        Stream audio for structured manga script data as MP3 chunks
+        
+        Chunks are yielded as soon as the provider sends them, segment by
+        segment in script order, so consumers (e.g. an HTTP streaming
+        response or a WebSocket) can start playback after the first chunk.
+        
+        Args:
+            manga_script: List of dictionaries with 'role' and 'description' keys
+            language: Language code
+            
+        Yields:
+            MP3 byte chunks
+        """
+        if not manga_script or len(manga_script) == 0:
+            raise ValueError("No script data provided for audio generation")
+        
+        provider = self._require_active_client()
+        combined_text_parts = self._collect_text_parts(manga_script, provider)
+        
+        if self.tts_provider == "speechify":
+            voice_id = self.speechify_voice_ids['narrator']
+            model = self._SPEECHIFY_MODEL_FOR_LANG.get(language, "simba-multilingual")
+            stream_one = functools.partial(self._stream_one_speechify, voice_id=voice_id, model=model, language=language)
         else:
-            if not self.elevenlabs_client:
-                raise Exception("ElevenLabs API is not configured. Please set ELEVENLABS_API_KEY environment variable.")
-            return self._generate_elevenlabs_audio(manga_script, language)
+            stream_one = self._stream_one_elevenlabs
+        
+        last = len(combined_text_parts) - 1
+        for i, text in enumerate(combined_text_parts):
+            # The SDK iterators block, so pull each chunk from a worker thread
+            chunks = iter(await asyncio.to_thread(stream_one, text))
+            # Drop per-segment ID3 tags mid-stream, as the file writers do
+            stripped = _iter_stripped_chunks(chunks, keep_header=(i == 0), keep_trailer=(i == last))
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(next, stripped, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        yield chunk
+            finally:
+                # Release the streaming HTTP response if the consumer stops early
+                stripped.close()
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
     
-    def _generate_speechify_audio(self, manga_script: "list[dict]", language: str = "en") -> str:
-        """Generate audio using Speechify API"""
-        if not self.speechify_client:
-            raise Exception("Speechify client not initialized")
+    async def _asynth_one_speechify(self, session, text: str, voice_id: str, model: str, language: str) -> bytes:
+        """Synthesize a single text segment through the Speechify REST API"""
+        cache_path = self._cache_path(self._speechify_cache_key(text, voice_id, model, language))
+        if cache_path is not None:
+            audio_bytes = await asyncio.to_thread(self._read_cache, cache_path)
+            if audio_bytes is not None:
+                return audio_bytes
         
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = f"manga_speechify_{timestamp}_{uuid.uuid4().hex[:8]}"
+        payload = {
+            "audio_format": "mp3",
+            "input": text,
+            "language": language,
+            "model": model,
+            "options": {
+                "loudness_normalization": True,
+                "text_normalization": True
+            },
+            "voice_id": voice_id
+        }
         
-        print(f"Processing {len(manga_script)} structured script segments with Speechify...")
+        async with session.post(
+            SPEECHIFY_SPEECH_URL,
+            data=json_dumps(payload),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            response.raise_for_status()
+            data = json_loads(await response.read())
+        
+        audio_bytes = b64decode(data["audio_data"])
+        
+        if cache_path is not None:
+            await asyncio.to_thread(self._write_cache, cache_path, audio_bytes)
+        
+        return audio_bytes
+    
+    def _new_base_filename(self, provider: str) -> str:
+        """Build a unique base filename for generated audio"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"manga_{provider}_{timestamp}_{secrets.token_hex(4)}"
+    
+    def _collect_text_parts(self, manga_script: "list[dict]", provider: str) -> "list[str]":
+        """Collect the non-empty script descriptions to synthesize, in script order"""
+        total = len(manga_script)
+        print(f"Processing {total} structured script segments with {provider}...")
         
         # Combine text parts
         combined_text_parts = []
@@ -206,10 +785,11 @@ class TTSGenerator:
             role = entry.get('role', '').lower()
             description = entry.get('description', '').strip()
             
-            print(f"Processing entry {i+1}/{len(manga_script)}: {role} - {description[:30]}...")
+            # Per-entry progress is debug-level; arguments are only formatted when enabled
+            logger.debug("Processing entry %d/%d: %s - %.30s...", i + 1, total, role, description)
             
             if not description:
-                print(f"  -> Skipping empty description")
+                logger.debug("  -> Skipping empty description")
                 continue
             
             combined_text_parts.append(description)
@@ -217,27 +797,46 @@ class TTSGenerator:
         if not combined_text_parts:
             raise ValueError("No valid segments found in manga script")
         
-        print(f"Combined {len(combined_text_parts)} text parts into single audio generation...")
+        return combined_text_parts
+    
+    def _generate_speechify_audio(self, manga_script: "list[dict]", language: str = "en") -> "tuple[list[bytes], str]":
+        """Generate per-segment audio using Speechify API"""
+        if not self.speechify_client:
+            raise Exception("Speechify client not initialized")
+        
+        combined_text_parts = self._collect_text_parts(manga_script, "Speechify")
         
-        # Join with pauses for better flow
+        print(f"Synthesizing {len(combined_text_parts)} text parts in parallel...")
+        
+        # Joined text is kept for the transcript
         combined_text = " ... ".join(combined_text_parts)
         
         # Determine voice ID based on language
         voice_id = self.speechify_voice_ids['narrator']
         
         # Determine model based on language
-        if language == "en":
-            model = "simba-english"
-        else:
-            model = "simba-multilingual"
+        model = self._SPEECHIFY_MODEL_FOR_LANG.get(language, "simba-multilingual")
         
         print(f"Generating Speechify audio with voice {voice_id}, model {model}...")
         print(f"Text length: {len(combined_text)} characters")
         
         try:
+            segment_audio = self._synthesize_segments(
+                lambda text: self._synth_one_speechify(text, voice_id, model, language),
+                combined_text_parts
+            )
+        except Exception as e:
+            print(f"Error generating Speechify audio: {e}")
+            raise
+        
+        return segment_audio, combined_text
+    
+    def _synth_one_speechify(self, text: str, voice_id: str, model: str, language: str) -> bytes:
+        """Synthesize a single text segment with Speechify and return the MP3 bytes"""
+        def synth():
             audio_response = self.speechify_client.tts.audio.speech(
                 audio_format="mp3",
-                input=combined_text,
+                input=text,
                 language=language,
                 model=model,
                 options=GetSpeechOptionsRequest(
@@ -248,66 +847,153 @@ class TTSGenerator:
             )
             
             # Decode audio data
-            audio_bytes = base64.b64decode(audio_response.audio_data)
-            
-            # Save the audio
-            save_file_path = f"{self.output_dir}/{base_filename}.mp3"
-            
-            with open(save_file_path, "wb") as f:
-                f.write(audio_bytes)
-            
-            print(f"Speechify audio saved at {save_file_path}")
-            
-            # Create transcript file
-            self._create_transcript_file(base_filename, manga_script, combined_text, "Speechify")
-            
-            return save_file_path
+            return b64decode(audio_response.audio_data)
+        
+        return self._cached_synth(self._speechify_cache_key(text, voice_id, model, language), synth)
+    
+    @staticmethod
+    def _speechify_cache_key(text: str, voice_id: str, model: str, language: str) -> str:
+        """Cache key source for a Speechify segment, shared by the sync and async paths"""
+        return f"speechify|{voice_id}|{model}|{language}|{text}"
+    
+    def _stream_one_speechify(self, text: str, voice_id: str, model: str, language: str) -> Iterator[bytes]:
+        """Synthesize a single text segment with the Speechify streaming endpoint, yielding MP3 chunks"""
+        return self.speechify_client.tts.audio.stream(
+            accept="audio/mpeg",
+            input=text,
+            language=language,
+            model=model,
+            # Same loudness as the file and in-memory paths
+            options=GetStreamOptionsRequest(loudness_normalization=True),
+            voice_id=voice_id
+        )
+    
+    def _cached_synth(self, key_source: str, synth) -> bytes:
+        """
+        Return MP3 bytes from the content-addressed cache, synthesizing on a miss
+        
+        Args:
+            key_source: Provider, voice, model, language and text identifying the audio
+            synth: Callable producing the MP3 bytes when the cache misses
             
-        except Exception as e:
-            print(f"Error generating Speechify audio: {e}")
-            raise
+        Returns:
+            MP3 bytes for the segment
+        """
+        cache_path = self._cache_path(key_source)
+        if cache_path is None:
+            return synth()
+        
+        audio_bytes = self._read_cache(cache_path)
+        if audio_bytes is None:
+            audio_bytes = synth()
+            self._write_cache(cache_path, audio_bytes)
+        
+        return audio_bytes
     
-    def _generate_elevenlabs_audio(self, manga_script: "list[dict]", language: str = "en") -> str:
-        """Generate audio using ElevenLabs API (legacy method)"""
-        if not self.elevenlabs_client or not ELEVENLABS_AVAILABLE or not VoiceSettings:
-            raise Exception("ElevenLabs client not properly initialized for multi-voice")
+    def _cache_path(self, key_source: str) -> Optional[str]:
+        """Path of the cache entry for key_source, or None when caching is disabled"""
+        if not self.cache_dir:
+            return None
         
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = f"manga_elevenlabs_{timestamp}_{uuid.uuid4().hex[:8]}"
+        key = hashlib.blake2b(key_source.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+    
+    def _read_cache(self, cache_path: str) -> Optional[bytes]:
+        """Read a cache entry, or return None on a miss"""
+        try:
+            with open(cache_path, "rb") as f:
+                audio_bytes = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # The cache is best-effort: an unreadable entry counts as a miss
+            print(f"Could not read cached audio segment: {e}")
+            return None
         
-        print(f"Processing {len(manga_script)} structured script segments with ElevenLabs...")
+        # Refresh the mtime so age-based cleanup evicts least recently used entries.
+        # The entry may already have been evicted; the bytes read are still valid.
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
         
-        # Combine text parts
-        combined_text_parts = []
+        return audio_bytes
+    
+    def _write_cache(self, cache_path: str, audio_bytes: bytes):
+        """
+        Publish a cache entry atomically so readers never see a partial file
         
-        for i, entry in enumerate(manga_script):
-            role = entry.get('role', '').lower()
-            description = entry.get('description', '').strip()
+        Best-effort: the audio has already been paid for, so a missing or
+        unwritable cache directory only skips caching.
+        """
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio_bytes)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache audio segment: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _synthesize_segments(self, synth_one, texts: "list[str]") -> "list[bytes]":
+        """
+        Synthesize text segments concurrently
+        
+        Args:
+            synth_one: Callable turning one text segment into MP3 bytes
+            texts: Text segments in script order
             
-            print(f"Processing entry {i+1}/{len(manga_script)}: {role} - {description[:30]}...")
+        Returns:
+            MP3 bytes for each segment, in the same order as texts
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.tts_concurrency) as executor:
+            futures = [executor.submit(synth_one, text) for text in texts]
+            concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
             
-            if not description:
-                print(f"  -> Skipping empty description")
-                continue
+            failed = next((f for f in futures if f.done() and f.exception() is not None), None)
+            if failed is not None:
+                # Don't send (and pay for) queued segments once one has failed
+                executor.shutdown(wait=False, cancel_futures=True)
+                failed.result()
             
-            combined_text_parts.append(description)
+            # Collect in submission order so the audio follows the script
+            return [future.result() for future in futures]
+    
+    def _generate_elevenlabs_audio(self, manga_script: "list[dict]", language: str = "en") -> "tuple[list[bytes], str]":
+        """Generate per-segment audio using ElevenLabs API (legacy method)"""
+        if not self.elevenlabs_client or not ELEVENLABS_AVAILABLE or not VoiceSettings:
+            raise Exception("ElevenLabs client not properly initialized for multi-voice")
         
-        if not combined_text_parts:
-            raise ValueError("No valid segments found in manga script")
+        combined_text_parts = self._collect_text_parts(manga_script, "ElevenLabs")
         
-        print(f"Combined {len(combined_text_parts)} text parts into single audio generation...")
+        print(f"Synthesizing {len(combined_text_parts)} text parts in parallel...")
         
-        # Join with pauses for better flow
+        # Joined text is kept for the transcript
         combined_text = " ... ".join(combined_text_parts)
         
         print(f"Generating ElevenLabs audio with narrator voice...")
         print(f"Text length: {len(combined_text)} characters")
         
+        segment_audio = self._synthesize_segments(self._synth_one_elevenlabs, combined_text_parts)
+        
+        return segment_audio, combined_text
+    
+    def _synth_one_elevenlabs(self, text: str) -> bytes:
+        """Synthesize a single text segment with ElevenLabs and return the MP3 bytes"""
+        return self._cached_synth(
+            f"elevenlabs|{self.voice_ids['narrator']}|eleven_turbo_v2|{text}",
+            lambda: b"".join(self._stream_one_elevenlabs(text))
+        )
+    
+    def _stream_one_elevenlabs(self, text: str) -> Iterator[bytes]:
+        """Synthesize a single text segment with ElevenLabs, yielding MP3 chunks as they arrive"""
         response = self.elevenlabs_client.text_to_speech.convert(
             voice_id=self.voice_ids['narrator'],
             optimize_streaming_latency="0",
             output_format="mp3_22050_32",
-            text=combined_text,
+            text=text,
             model_id="eleven_turbo_v2",
             voice_settings=VoiceSettings(
                 stability=0.2,
@@ -317,52 +1003,48 @@ class TTSGenerator:
             ),
         )
         
-        # Save the audio
-        save_file_path = f"{self.output_dir}/{base_filename}.mp3"
-        
-        with open(save_file_path, "wb") as f:
+        try:
             for chunk in response:
                 if chunk:
-                    f.write(chunk)
-        
-        print(f"ElevenLabs audio saved at {save_file_path}")
-        
-        # Create transcript file
-        self._create_transcript_file(base_filename, manga_script, combined_text, "ElevenLabs")
-        
-        return save_file_path
+                    yield chunk
+        finally:
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
     
     def _create_transcript_file(self, base_filename: str, manga_script: "list[dict]", combined_text: str, provider: str):
         """Create a detailed transcript file"""
         transcript_path = f"{self.output_dir}/{base_filename}_transcript.txt"
-        with open(transcript_path, "w", encoding="utf-8") as f:
-            f.write(f"STRUCTURED MULTI-VOICE MANGA AUDIO TRANSCRIPT ({provider})\n")
-            f.write("=" * 60 + "\n\n")
-            f.write(f"Generated: {datetime.datetime.now()}\n")
-            f.write(f"Provider: {provider}\n")
-            f.write(f"Script Segments: {len(manga_script)}\n")
-            f.write(f"Language: {self.current_language}\n")
-            f.write(f"Speech Rate: {self.current_rate} WPM\n\n")
-            f.write(f"Combined Text ({len(combined_text)} chars):\n")
-            f.write(f"{combined_text}\n\n")
-            f.write("Original Structured Script:\n")
-            
-            for i, entry in enumerate(manga_script, 1):
-                role = entry.get('role', 'unknown').upper()
-                description = entry.get('description', '')
-                f.write(f"{i}. [{role}]: {description}\n")
+        
+        # Build the whole transcript in memory and write it once
+        parts = [
+            f"STRUCTURED MULTI-VOICE MANGA AUDIO TRANSCRIPT ({provider})\n",
+            "=" * 60 + "\n\n",
+            f"Generated: {datetime.datetime.now()}\n",
+            f"Provider: {provider}\n",
+            f"Script Segments: {len(manga_script)}\n",
+            f"Language: {self.current_language}\n",
+            f"Speech Rate: {self.current_rate} WPM\n\n",
+            f"Combined Text ({len(combined_text)} chars):\n",
+            f"{combined_text}\n\n",
+            "Original Structured Script:\n"
+        ]
+        parts.extend(
+            f"{i}. [{entry.get('role', 'unknown').upper()}]: {entry.get('description', '')}\n"
+            for i, entry in enumerate(manga_script, 1)
+        )
+        
+        _write_file_bytes(transcript_path, "".join(parts).encode("utf-8"))
     
     def _has_voice_cues(self, text: str) -> bool:
         """Check if text contains narrator/character voice cues"""
-        import re
         # Look for patterns like [narrator text], "Character: dialogue", etc.
-        narrator_pattern = r'\[.*?\]'
-        character_pattern = r'^[A-Z][a-zA-Z\s]*:\s+'
-        
-        has_narrator = bool(re.search(narrator_pattern, text))
-        has_character = bool(re.search(character_pattern, text, re.MULTILINE))
-        
-        return has_narrator or has_character
+        # The substring checks skip the regex when a cue is impossible
+        if '[' in text and self._NARRATOR_CUE_RE.search(text):
+            return True
+        if ':' in text and self._CHARACTER_CUE_RE.search(text):
+            return True
+        return False
     
     def _parse_script(self, text: str) -> "list[dict]":
         """
@@ -374,45 +1056,34 @@ class TTSGenerator:
         Returns:
             List of dictionaries with 'role', 'text', and 'voice_id' keys
         """
-        import re
+        narrator_voice = self._narrator_voice
+        character_voice = self._character_voice
         
         segments = []
-        lines = text.split('\n')
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
+        for match in self._SCRIPT_RE.finditer(text):
             # Check for narrator text (enclosed in brackets)
-            narrator_match = re.match(r'\[(.*?)\]', line)
-            if narrator_match:
+            if match['narrator'] is not None:
                 segments.append({
                     'role': 'narrator',
-                    'text': narrator_match.group(1).strip(),
-                    'voice_id': self.voice_ids['narrator'] if self.tts_provider == "elevenlabs" else self.speechify_voice_ids['narrator']
+                    'text': match['narrator'].strip(),
+                    'voice_id': narrator_voice
                 })
-                continue
-            
             # Check for character dialogue (Character: text)
-            character_match = re.match(r'^([A-Z][a-zA-Z\s]*?):\s*(.+)$', line)
-            if character_match:
-                character_name = character_match.group(1).strip()
-                dialogue = character_match.group(2).strip()
+            elif match['character'] is not None:
                 segments.append({
                     'role': 'character',
-                    'character_name': character_name,
-                    'text': dialogue,
-                    'voice_id': self.voice_ids['character'] if self.tts_provider == "elevenlabs" else self.speechify_voice_ids['character']
+                    'character_name': match['character'].strip(),
+                    'text': match['dialogue'].strip(),
+                    'voice_id': character_voice
                 })
-                continue
-            
             # Default: treat as narrator if no specific format
-            segments.append({
-                'role': 'narrator',
-                'text': line,
-                'voice_id': self.voice_ids['narrator'] if self.tts_provider == "elevenlabs" else self.speechify_voice_ids['narrator']
-            })
+            else:
+                segments.append({
+                    'role': 'narrator',
+                    'text': match['default'],
+                    'voice_id': narrator_voice
+                })
         
         return segments
     
@@ -426,7 +1097,7 @@ class TTSGenerator:
                 "provider": self.tts_provider
             }
         
-        words = len(text.split())
+        words = _count_words(text)
         chars = len(text)
         estimated_duration = words / (self.current_rate / 60)  # Convert WPM to words per second
         
@@ -455,24 +1126,37 @@ class TTSGenerator:
     
     def cleanup_old_files(self, max_age_hours: int = 24):
         """Clean up old audio files from the output directory"""
-        audio_dir = self.output_dir
-        if not os.path.exists(audio_dir):
+        removed_files = self._remove_old_files(self.output_dir, max_age_hours)
+        print(f"Cleaned up {removed_files} old audio files")
+    
+    def cleanup_cache(self, max_age_hours: int = 24 * 7):
+        """Evict cached segment audio that has not been used within max_age_hours"""
+        if not self.cache_dir:
             return
         
+        removed_files = self._remove_old_files(self.cache_dir, max_age_hours)
+        print(f"Cleaned up {removed_files} cached audio segments")
+    
+    def _remove_old_files(self, directory: str, max_age_hours: int) -> int:
+        """Remove files older than max_age_hours from a directory and return how many were removed"""
+        if not os.path.exists(directory):
+            return 0
+        
         cutoff_time = time.time() - (max_age_hours * 3600)
         removed_files = 0
         
-        for filename in os.listdir(audio_dir):
-            file_path = os.path.join(audio_dir, filename)
-            if os.path.isfile(file_path):
-                if os.path.getmtime(file_path) < cutoff_time:
+        # scandir entries carry the file type from the directory listing,
+        # so each file costs at most one stat call
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff_time:
                     try:
-                        os.remove(file_path)
+                        os.remove(entry.path)
                         removed_files += 1
                     except Exception as e:
-                        print(f"Could not remove {file_path}: {e}")
+                        print(f"Could not remove {entry.path}: {e}")
         
-        print(f"Cleaned up {removed_files} old audio files")
+        return removed_files
     
     def get_available_voices(self) -> Dict[str, Any]:
         """Get available voices for the current provider"""
@@ -510,29 +1194,69 @@ class TTSGenerator:
         """
         if not voices:
             return []
-            
-        results = []
-
-        for voice in voices:
-            # gender filter
-            if gender and voice.gender.lower() != gender.lower():
-                continue
-
-            # locale filter (check across models and languages)
-            if locale:
-                if not any(
-                    any(lang.locale == locale for lang in model.languages)
-                    for model in voice.models
-                ):
-                    continue
-
-            # tags filter
-            if tags:
-                if not all(tag in voice.tags for tag in tags):
-                    continue
-
-            # If we got here, the voice matches -> collect model ids
-            for model in voice.models:
-                results.append(model.name)
-
-        return results
\ No newline at end of file
+        
+        index = self._get_voice_index(voices)
+        
+        # locale filter narrows the candidate set first, then intersect the rest
+        if locale:
+            candidates = index["by_locale"].get(locale, set())
+        else:
+            candidates = set(range(len(voices)))
+        
+        if gender:
+            candidates = candidates & index["by_gender"].get(gender.lower(), set())
+        
+        if tags:
+            for tag in tags:
+                candidates = candidates & index["by_tag"].get(tag, set())
+        
+        # Keep the original voice order in the result
+        models_of_voice = index["models_of_voice"]
+        return [name for position in sorted(candidates) for name in models_of_voice[position]]
+    
+    def _get_voice_index(self, voices) -> Dict[str, Any]:
+        """
+        Build (once per voice list) the lookup indexes used by filter_voice_models.
+        
+        Voices are identified by their position in the list; the index is
+        reused only while the list still holds the same voice objects in the
+        same order, so a list mutated in place gets a fresh index.
+        
+        Args:
+            voices (list): List of GetVoice objects.
+        
+        Returns:
+            Dict[str, Any]: by_locale/by_gender/by_tag sets of positions and
+            the model names of each voice.
+        """
+        source = self._voice_index_source
+        if (
+            self._voice_index is not None
+            and len(source) == len(voices)
+            and all(cached is voice for cached, voice in zip(source, voices))
+        ):
+            return self._voice_index
+        
+        by_locale = defaultdict(set)
+        by_gender = defaultdict(set)
+        by_tag = defaultdict(set)
+        models_of_voice = []
+        
+        for position, voice in enumerate(voices):
+            by_gender[(voice.gender or "").lower()].add(position)
+            for tag in voice.tags or ():
+                by_tag[tag].add(position)
+            # The SDK types models and languages as optional
+            for model in voice.models or ():
+                for lang in model.languages or ():
+                    by_locale[lang.locale].add(position)
+            models_of_voice.append([model.name for model in voice.models or ()])
+        
+        self._voice_index = {
+            "by_locale": by_locale,
+            "by_gender": by_gender,
+            "by_tag": by_tag,
+            "models_of_voice": models_of_voice,
+        }
+        self._voice_index_source = tuple(voices)
+        return self._voice_index
\ No newline at end of file
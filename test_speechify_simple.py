@@ -2,22 +2,16 @@
 """
 Simple test script for Speechify TTS migration
 This script can be run to test the migration without requiring pytest
+Its checks are named check_* so pytest does not collect them a second time
 """
 
 import os
-import sys
 from dotenv import load_dotenv
 
-# Add the project root to the path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
 from modules.tts_generator import TTSGenerator
 
-# Load environment variables
-load_dotenv()
-
 
-def test_speechify_migration():
+def check_speechify_migration():
     """Test the Speechify migration functionality"""
     print("🧪 Testing Speechify TTS Migration")
     print("=" * 50)
@@ -130,7 +124,7 @@ def test_speechify_migration():
     return True
 
 
-def test_backward_compatibility():
+def check_backward_compatibility():
     """Test backward compatibility with ElevenLabs"""
     print("\n🔄 Testing Backward Compatibility")
     print("=" * 50)
@@ -184,11 +178,14 @@ def main():
     print("🚀 Speechify TTS Migration Test Suite")
     print("=" * 60)
     
+    # Load environment variables (pytest runs get them from conftest.py)
+    load_dotenv()
+    
     # Test Speechify migration
-    speechify_success = test_speechify_migration()
+    speechify_success = check_speechify_migration()
     
     # Test backward compatibility
-    compatibility_success = test_backward_compatibility()
+    compatibility_success = check_backward_compatibility()
     
     # Summary
     print("\n📋 Test Summary")
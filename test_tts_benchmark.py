@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for TTS audio generation
+Tracks generate_audio_from_script latency per provider so slowdowns fail CI
+"""
+
+import os
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.benchmark(group="tts-ttfu")
+@pytest.mark.xdist_group("speechify_api")
+@pytest.mark.usefixtures("mock_tts_http")
+@pytest.mark.parametrize("provider", [
+    pytest.param("speechify", marks=pytest.mark.skipif(
+        "config.getoption('--run-live') and not os.getenv('SPEECHIFY_API_KEY')",
+        reason="SPEECHIFY_API_KEY not available"
+    )),
+    pytest.param("elevenlabs", marks=pytest.mark.skipif(
+        "config.getoption('--run-live') and not os.getenv('ELEVENLABS_API_KEY')",
+        reason="ELEVENLABS_API_KEY not available"
+    ))
+])
+def test_generate_audio_from_script_latency(benchmark, TTSGeneratorCls, tmp_path, sample_manga_script, run_live, provider):
+    """Benchmark end-to-end audio generation for a short script (mocked HTTP unless --run-live)"""
+    # No cache_dir, so every round goes through the provider request path
+    tts = TTSGeneratorCls(output_dir=str(tmp_path), tts_provider=provider)
+    assert tts.tts_provider == provider
+    
+    # Keep live runs to a handful of billable API calls
+    rounds = 3 if run_live else 20
+    audio_path = benchmark.pedantic(
+        tts.generate_audio_from_script,
+        args=(sample_manga_script, "en"),
+        rounds=rounds,
+        iterations=1
+    )
+    
+    assert os.path.exists(audio_path)
+    assert audio_path.endswith(".mp3")
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Unit tests for TTS generator internals
+Covers the segment cache and the pure helpers of modules.tts_generator
+"""
+
+import os
+import time
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+# Stand-in MPEG frame data and an ID3v1 trailer (always exactly 128 bytes)
+AUDIO = b"\xff\xfb\x90\xc0" + bytes(200)
+ID3V1 = b"TAG" + bytes(125)
+
+
+def _id3v2(body_size: int, footer: bool = False) -> bytes:
+    """Build an ID3v2.4 tag whose header declares body_size as a synchsafe integer"""
+    size = bytes([(body_size >> 21) & 0x7f, (body_size >> 14) & 0x7f, (body_size >> 7) & 0x7f, body_size & 0x7f])
+    flags = b"\x10" if footer else b"\x00"
+    return b"ID3\x04\x00" + flags + size + b"\x01" * body_size + (b"3DI" + bytes(7) if footer else b"")
+
+
+@pytest.fixture
+def tts(TTSGeneratorCls, mock_tts_clients, tmp_path):
+    """Speechify TTS generator with mocked clients"""
+    return TTSGeneratorCls(output_dir=str(tmp_path), tts_provider="speechify")
+
+
+@pytest.fixture
+def cached_tts(TTSGeneratorCls, mock_tts_clients, tmp_path):
+    """Speechify TTS generator with mocked clients and a segment cache under tmp_path"""
+    return TTSGeneratorCls(
+        output_dir=str(tmp_path / "audio"),
+        tts_provider="speechify",
+        cache_dir=str(tmp_path / "cache")
+    )
+
+
+class TestSegmentCache:
+    """Test the content-addressed segment audio cache"""
+    
+    def test_miss_then_hit_reads_from_disk(self, cached_tts):
+        """Test a miss synthesizes and publishes the entry, and a hit reads it back"""
+        calls = []
+        
+        def synth():
+            calls.append(1)
+            return b"segment audio"
+        
+        assert cached_tts._cached_synth("speechify|voice|model|en|Hello", synth) == b"segment audio"
+        assert cached_tts._cached_synth("speechify|voice|model|en|Hello", synth) == b"segment audio"
+        assert len(calls) == 1
+        
+        # Exactly one published entry and no leftover temporary files
+        entries = os.listdir(cached_tts.cache_dir)
+        assert len(entries) == 1
+        assert entries[0].endswith(".mp3")
+        with open(os.path.join(cached_tts.cache_dir, entries[0]), "rb") as f:
+            assert f.read() == b"segment audio"
+    
+    def test_different_keys_do_not_collide(self, cached_tts):
+        """Test each key source gets its own entry"""
+        assert cached_tts._cached_synth("speechify|voice|model|en|A", lambda: b"a") == b"a"
+        assert cached_tts._cached_synth("speechify|voice|model|en|B", lambda: b"b") == b"b"
+        assert len(os.listdir(cached_tts.cache_dir)) == 2
+    
+    def test_hit_survives_failed_mtime_refresh(self, cached_tts, monkeypatch):
+        """Test an entry evicted right after it was read is not synthesized again"""
+        cached_tts._cached_synth("speechify|voice|model|en|Hello", lambda: b"segment audio")
+        
+        def evicted(path, *args, **kwargs):
+            raise FileNotFoundError(path)
+        
+        monkeypatch.setattr(os, "utime", evicted)
+        
+        def synth():
+            raise AssertionError("cache hit must not call the provider")
+        
+        assert cached_tts._cached_synth("speechify|voice|model|en|Hello", synth) == b"segment audio"
+    
+    def test_missing_cache_dir_does_not_fail_generation(self, cached_tts):
+        """Test a deleted cache directory skips caching instead of losing the synthesized audio"""
+        os.rmdir(cached_tts.cache_dir)
+        calls = []
+        
+        def synth():
+            calls.append(1)
+            return b"segment audio"
+        
+        assert cached_tts._cached_synth("speechify|voice|model|en|Hello", synth) == b"segment audio"
+        assert len(calls) == 1
+    
+    def test_unreadable_entry_is_a_miss(self, cached_tts, monkeypatch):
+        """Test an entry that cannot be read is synthesized again instead of raising"""
+        cached_tts._cached_synth("speechify|voice|model|en|Hello", lambda: b"stale")
+        
+        real_open = open
+        
+        def deny_reads(path, mode="r", *args, **kwargs):
+            if str(path).startswith(cached_tts.cache_dir) and mode == "rb":
+                raise PermissionError(path)
+            return real_open(path, mode, *args, **kwargs)
+        
+        monkeypatch.setattr("builtins.open", deny_reads)
+        
+        assert cached_tts._cached_synth("speechify|voice|model|en|Hello", lambda: b"fresh") == b"fresh"
+    
+    def test_async_generation_reads_cache(self, cached_tts, monkeypatch):
+        """Test agenerate_audio_from_script serves cached segments without calling the API"""
+        pytest.importorskip("aiohttp")
+        pytest.importorskip("aiofiles")
+        
+        # Any request that slips through fails fast instead of reaching Speechify
+        monkeypatch.setattr("modules.tts_generator.SPEECHIFY_SPEECH_URL", "http://127.0.0.1:9/v1/audio/speech")
+        
+        voice_id = cached_tts.speechify_voice_ids["narrator"]
+        model = cached_tts._SPEECHIFY_MODEL_FOR_LANG["en"]
+        script = [
+            {"role": "narrator", "description": "First line."},
+            {"role": "character", "description": "Second line."}
+        ]
+        for entry, audio in zip(script, (b"first", b"second")):
+            key_source = cached_tts._speechify_cache_key(entry["description"], voice_id, model, "en")
+            cached_tts._cached_synth(key_source, lambda audio=audio: audio)
+        
+        audio_path = asyncio.run(cached_tts.agenerate_audio_from_script(script, "en"))
+        
+        with open(audio_path, "rb") as f:
+            assert f.read() == b"firstsecond"
+
+
+class TestParseScript:
+    """Test _parse_script on edge cases, pinned to the original line-by-line parser's output"""
+    
+    @pytest.mark.parametrize("script,expected", [
+        ("[Intro]\n\n   \n\t\nHero: Hi", [("narrator", "Intro", None), ("character", "Hi", "Hero")]),
+        (" \n\t \n", []),
+        ("Hero:", [("narrator", "Hero:", None)]),
+        ("Hero:   ", [("narrator", "Hero:", None)]),
+        ("[a] trailing", [("narrator", "a", None)]),
+        ("[Scene]\r\nHero: Hi there\r", [("narrator", "Scene", None), ("character", "Hi there", "Hero")]),
+        ("   [Indented]\n\tHero:  spaced out  ", [("narrator", "Indented", None), ("character", "spaced out", "Hero")]),
+        ("Mr Smith: Hello", [("character", "Hello", "Mr Smith")]),
+        ("hero: not a cue", [("narrator", "hero: not a cue", None)])
+    ], ids=[
+        "blank_lines",
+        "whitespace_only",
+        "empty_dialogue",
+        "empty_dialogue_trailing_space",
+        "bracket_with_trailing_text",
+        "carriage_returns",
+        "indented_lines",
+        "multi_word_name",
+        "lowercase_name"
+    ])
+    def test_parse_script_edge_cases(self, tts, script, expected):
+        """Test roles, texts and character names for one script"""
+        segments = tts._parse_script(script)
+        
+        assert [(s["role"], s["text"], s.get("character_name")) for s in segments] == expected
+        for segment in segments:
+            assert segment["voice_id"] == tts.speechify_voice_ids[segment["role"]]
+
+
+class TestId3Stripping:
+    """Test ID3 tag removal when MP3 segments are joined"""
+    
+    @pytest.mark.parametrize("data,expected", [
+        (_id3v2(20) + AUDIO, AUDIO),
+        (_id3v2(200) + AUDIO, AUDIO),
+        (_id3v2(20, footer=True) + AUDIO, AUDIO),
+        (AUDIO + ID3V1, AUDIO),
+        (_id3v2(20) + AUDIO + ID3V1, AUDIO),
+        (AUDIO, AUDIO),
+        (b"ID3\x04\x00", b"ID3\x04\x00"),
+        (b"", b""),
+        (_id3v2(500)[:30], b"")
+    ], ids=[
+        "id3v2",
+        "id3v2_multibyte_size",
+        "id3v2_footer",
+        "id3v1_trailer",
+        "both_tags",
+        "untagged",
+        "shorter_than_header",
+        "empty",
+        "truncated_tag"
+    ])
+    def test_strip_id3(self, tts_module, data, expected):
+        """Test leading ID3v2 and trailing ID3v1 tags are removed"""
+        assert bytes(tts_module._strip_id3(data)) == expected
+    
+    def test_strip_id3_keeps_requested_tags(self, tts_module):
+        """Test keep_header and keep_trailer retain the matching tag"""
+        data = _id3v2(20) + AUDIO + ID3V1
+        
+        assert bytes(tts_module._strip_id3(data, keep_header=True)) == _id3v2(20) + AUDIO
+        assert bytes(tts_module._strip_id3(data, keep_trailer=True)) == AUDIO + ID3V1
+        assert bytes(tts_module._strip_id3(data, keep_header=True, keep_trailer=True)) == data
+    
+    def test_short_segment_keeps_tag_like_tail(self, tts_module):
+        """Test a trailing TAG is only stripped when a full 128-byte trailer fits"""
+        data = _id3v2(20) + ID3V1[:100]
+        
+        assert bytes(tts_module._strip_id3(data)) == ID3V1[:100]
+    
+    def test_iter_mp3_segments_keeps_outer_tags_only(self, tts_module):
+        """Test only the first ID3v2 header and the last ID3v1 trailer survive"""
+        segments = [_id3v2(20) + AUDIO + ID3V1] * 3
+        
+        joined = b"".join(tts_module._iter_mp3_segments(segments))
+        
+        assert joined == _id3v2(20) + AUDIO * 3 + ID3V1
+    
+    def test_iter_mp3_segments_single_segment_unchanged(self, tts_module):
+        """Test a single segment keeps both of its tags"""
+        segment = _id3v2(20) + AUDIO + ID3V1
+        
+        assert b"".join(tts_module._iter_mp3_segments([segment])) == segment
+    
+    @pytest.mark.parametrize("chunk_size", [1, 3, 10, 127, 4096])
+    @pytest.mark.parametrize("keep_header,keep_trailer", [(False, False), (True, False), (False, True), (True, True)])
+    def test_iter_stripped_chunks_matches_strip_id3(self, tts_module, chunk_size, keep_header, keep_trailer):
+        """Test streamed stripping yields the same bytes however the segment is chunked"""
+        for data in (_id3v2(20, footer=True) + AUDIO + ID3V1, _id3v2(20) + AUDIO, AUDIO + ID3V1, b"ID3\x04"):
+            chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+            
+            streamed = b"".join(tts_module._iter_stripped_chunks(iter(chunks), keep_header, keep_trailer))
+            
+            assert streamed == bytes(tts_module._strip_id3(data, keep_header, keep_trailer))
+    
+    def test_stream_audio_from_script_strips_inner_tags(self, tts_module, tts):
+        """Test streamed audio matches the joined file output, without mid-stream tags"""
+        segment = _id3v2(20) + AUDIO + ID3V1
+        stream = tts.speechify_client.tts.audio.stream
+        stream.reset_mock()
+        stream.side_effect = lambda **kwargs: iter([segment[:7], segment[7:150], segment[150:]])
+        script = [{"role": "narrator", "description": f"Line {i}"} for i in range(3)]
+        
+        async def collect():
+            return b"".join([chunk async for chunk in tts.stream_audio_from_script(script)])
+        
+        assert asyncio.run(collect()) == b"".join(tts_module._iter_mp3_segments([segment] * 3))
+        
+        # Requested like the file path: same voice, model and loudness normalization
+        assert stream.call_count == 3
+        tts_module.GetStreamOptionsRequest.assert_called_with(loudness_normalization=True)
+        assert stream.call_args.kwargs == {
+            "accept": "audio/mpeg",
+            "input": "Line 2",
+            "language": "en",
+            "model": tts._SPEECHIFY_MODEL_FOR_LANG["en"],
+            "options": tts_module.GetStreamOptionsRequest.return_value,
+            "voice_id": tts.speechify_voice_ids["narrator"]
+        }
+
+
+class TestCountWords:
+    """Test the windowed word counter against str.split"""
+    
+    @pytest.mark.parametrize("text", [
+        "",
+        "   ",
+        "a",
+        "abc",
+        "abcdefg",
+        "ab cd ef",
+        "abc def ghi",
+        "abcd  efgh",
+        "a  b   c    d",
+        "  leading and trailing  ",
+        "ab\n\ncd\t\tef",
+        "one\u3000two\xa0three",
+        "x" * 10 + " " * 7 + "y" * 5
+    ])
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 64 * 1024])
+    def test_matches_split(self, tts_module, text, chunk_size):
+        """Test words and whitespace runs crossing window boundaries are counted once"""
+        assert tts_module._count_words(text, chunk_size=chunk_size) == len(text.split())
+
+
+class TestRequireActiveClient:
+    """Test every entry point rejects an unconfigured provider the same way"""
+    
+    @pytest.mark.parametrize("provider,client_attr,message", [
+        ("speechify", "speechify_client", "SPEECHIFY_API_KEY"),
+        ("elevenlabs", "elevenlabs_client", "ELEVENLABS_API_KEY")
+    ])
+    def test_entry_points_require_client(self, tts, provider, client_attr, message):
+        """Test file, in-memory and streaming generation raise before synthesizing"""
+        tts.tts_provider = provider
+        setattr(tts, client_attr, None)
+        script = [{"role": "narrator", "description": "Hello"}]
+        
+        with pytest.raises(Exception, match=message):
+            tts.generate_audio_from_script(script)
+        with pytest.raises(Exception, match=message):
+            tts.generate_audio_from_script_to_stream(script)
+        with pytest.raises(Exception, match=message):
+            asyncio.run(tts.stream_audio_from_script(script).__anext__())
+
+
+class TestVoiceIndex:
+    """Test reuse and invalidation of the filter_voice_models index"""
+    
+    def test_index_reused_for_unchanged_list(self, tts, make_voice):
+        """Test repeated lookups on the same voices share one index"""
+        voices = [make_voice("a"), make_voice("b")]
+        
+        first = tts._get_voice_index(voices)
+        
+        assert tts._get_voice_index(voices) is first
+        assert tts._get_voice_index(list(voices)) is first
+    
+    def test_index_rebuilt_after_in_place_mutation(self, tts, make_voice):
+        """Test appending to or replacing items in the same list is picked up"""
+        voices = [make_voice("a")]
+        assert tts.filter_voice_models(voices, gender="male") == ["a"]
+        
+        voices.append(make_voice("b"))
+        assert tts.filter_voice_models(voices, gender="male") == ["a", "b"]
+        assert tts.filter_voice_models(voices) == ["a", "b"]
+        
+        voices[0] = make_voice("c", gender="female")
+        assert tts.filter_voice_models(voices, gender="male") == ["b"]
+        
+        del voices[1]
+        assert tts.filter_voice_models(voices) == ["c"]
+    
+    def test_voices_without_models_or_languages(self, tts, make_voice):
+        """Test voices whose optional models/languages are None are indexed, not fatal"""
+        no_models = make_voice("unused")
+        no_models.models = None
+        no_languages = make_voice("b")
+        no_languages.models[0].languages = None
+        voices = [make_voice("a"), no_models, no_languages]
+        
+        assert tts.filter_voice_models(voices) == ["a", "b"]
+        assert tts.filter_voice_models(voices, locale="en-US") == ["a"]
+        assert tts.filter_voice_models(voices, gender="male") == ["a", "b"]
+    
+    def test_available_voices_lists_voices_without_models(self, tts, make_voice):
+        """Test get_available_voices returns every voice even if one has no models"""
+        no_models = make_voice("unused")
+        no_models.models = None
+        tts.speechify_client.tts.voices.list.return_value = [make_voice("a"), no_models]
+        
+        available = tts.get_available_voices()
+        
+        assert available["count"] == 2
+        assert tts.filter_voice_models(available["voices"]) == ["a"]
+
+
+class TestSynthesizeSegments:
+    """Test concurrent segment synthesis"""
+    
+    def test_results_follow_script_order(self, tts):
+        """Test segments finishing out of order are returned in script order"""
+        def synth_one(text):
+            time.sleep(0.01 * (5 - int(text)))
+            return text.encode()
+        
+        assert tts._synthesize_segments(synth_one, [str(i) for i in range(5)]) == [b"0", b"1", b"2", b"3", b"4"]
+    
+    def test_failure_cancels_queued_segments(self, tts):
+        """Test a failed segment stops the remaining segments from being requested"""
+        tts.tts_concurrency = 2
+        calls = []
+        
+        def synth_one(text):
+            calls.append(text)
+            if text == "0":
+                raise RuntimeError("synthesis failed")
+            time.sleep(0.05)
+            return text.encode()
+        
+        with pytest.raises(RuntimeError, match="synthesis failed"):
+            tts._synthesize_segments(synth_one, [str(i) for i in range(20)])
+        
+        # Only segments already picked up by a worker were sent
+        assert len(calls) <= 4
+
+
+class TestPrewarmConnections:
+    """Test opt-in connection prewarming"""
+    
+    def test_closed_client_is_reported_not_raised(self, tts, capsys):
+        """Test warm-up on an already closed client prints a warning instead of raising"""
+        httpx = pytest.importorskip("httpx")
+        tts.http_client = httpx.Client()
+        tts.http_client.close()
+        
+        tts.prewarm_connections(background=False)
+        
+        assert "Could not prewarm connection" in capsys.readouterr().out
+    
+    def test_close_before_background_warm_up_runs(self, tts_module, tts, monkeypatch, capsys):
+        """Test close() racing the warm-up thread does not crash it"""
+        httpx = pytest.importorskip("httpx")
+        tts.http_client = httpx.Client()
+        started = []
+        
+        class DeferredThread:
+            """Holds the warm-up thread back until the test runs it"""
+            def __init__(self, target, daemon):
+                self.target = target
+            
+            def start(self):
+                started.append(self.target)
+        
+        monkeypatch.setattr(tts_module, "threading", SimpleNamespace(Thread=DeferredThread))
+        
+        tts.prewarm_connections()
+        tts.close()
+        started[0]()
+        
+        assert "Could not prewarm connection" in capsys.readouterr().out